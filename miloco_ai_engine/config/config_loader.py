@@ -6,14 +6,20 @@ Configuration loader module
 Common YAML configuration loading functionality
 """
 
+import copy
+import functools
 from pathlib import Path
 import yaml
 from typing import Dict, Any
 
+# libyaml C loader when available, falls back to the pure Python loader
+_SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
 
 def load_yaml_config(config_file_path: Path) -> Dict[str, Any]:
     """
     Load configuration from YAML file
+    The file is parsed once per path, each caller gets its own copy
     
     Args:
         config_file_path: Path to the YAML configuration file
@@ -25,9 +31,14 @@ def load_yaml_config(config_file_path: Path) -> Dict[str, Any]:
         FileNotFoundError: If the configuration file is not found
         ValueError: If the YAML file format is invalid
     """
+    return copy.deepcopy(_parse_yaml_config(config_file_path))
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_yaml_config(config_file_path: Path) -> Dict[str, Any]:
     try:
         with open(config_file_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+            return yaml.load(f, Loader=_SafeLoader)
     except FileNotFoundError as exc:
         raise FileNotFoundError(f'Configuration file not found: {config_file_path}') from exc
     except yaml.YAMLError as exc:
@@ -51,6 +51,9 @@ class MiotProxy:
         # two times cache ttl, at least 1 second
         # frame_interval * cache_max_size / 1000 * 2 = seconds
         self._camera_img_cache_ttl: int = max(1, int(self._frame_interval * self._camera_img_cache_max_size / 1000 * 2))
+        # Camera video qualities, validated and converted once
+        self._camera_qualities: dict[str, MIoTCameraVideoQuality] = self._load_camera_qualities()
+        self._default_camera_quality = MIoTCameraVideoQuality(CAMERA_CONFIG.get("default_quality", 2))
         
     @property
     def miot_client(self) -> MIoTClient:
@@ -172,26 +175,32 @@ class MiotProxy:
             raise
 
 
-    def _get_camera_quality(self, camera_did: str) -> MIoTCameraVideoQuality:
-        """Get the video quality for a specific camera."""
-        # Check if camera has specific quality configuration
-        camera_qualities = CAMERA_CONFIG.get("camera_qualities", {})
-        if camera_did in camera_qualities:
-            quality_value = camera_qualities[camera_did]
+    @staticmethod
+    def _load_camera_qualities() -> dict[str, MIoTCameraVideoQuality]:
+        """Load the per-camera video quality configuration."""
+        camera_qualities: dict[str, MIoTCameraVideoQuality] = {}
+        for camera_did, quality_value in (CAMERA_CONFIG.get("camera_qualities") or {}).items():
             # Validate quality value
             if quality_value in [1, 2, 3]:
-                quality = MIoTCameraVideoQuality(quality_value)
-                logger.info("Using configured quality %s for camera %s", quality.name, camera_did)
-                return quality
+                # Unquoted numeric dids are parsed as int from yaml
+                camera_qualities[str(camera_did)] = MIoTCameraVideoQuality(quality_value)
             else:
                 logger.warning(
                     "Invalid quality value %s for camera %s, using default",
                     quality_value, camera_did
                 )
-        
+        return camera_qualities
+
+    def _get_camera_quality(self, camera_did: str) -> MIoTCameraVideoQuality:
+        """Get the video quality for a specific camera."""
+        # Check if camera has specific quality configuration
+        quality = self._camera_qualities.get(camera_did)
+        if quality is not None:
+            logger.info("Using configured quality %s for camera %s", quality.name, camera_did)
+            return quality
+
         # Use default quality
-        default_quality = CAMERA_CONFIG.get("default_quality", 2)
-        quality = MIoTCameraVideoQuality(default_quality)
+        quality = self._default_camera_quality
         logger.info("Using default quality %s for camera %s", quality.name, camera_did)
         return quality
 
@@ -203,7 +203,8 @@ class MIoTCameraInstance:
                 audio_callback=self.__on_audio_decode_callback,
                 enable_hw_accel=self._enable_hw_accel,
                 enable_audio=self._enable_audio,
-                main_loop=self._main_loop
+                main_loop=self._main_loop,
+                hw_device_path=self._hw_device_path
             )
             self._decoders.append(decoder)
             decoder.daemon = True
@@ -493,11 +494,14 @@ class MIoTCameraInstance:
         """On video decode callback."""
         # _LOGGER.info("decode jpg, %s, %s, %s, %s", self._did, len(data), timestamp, channel)
         v_callbacks = self._callbacks.get(f"decode_jpg.{channel}", {})
-        for callback in list(v_callbacks.values()):
-            asyncio.run_coroutine_threadsafe(
-                callback(self._did, data, timestamp, channel),
-                self._main_loop
-            )
+        # Wait for the consumers, the decoder holds a snapshot slot until they are done
+        results = await asyncio.gather(
+            *(callback(self._did, data, timestamp, channel) for callback in list(v_callbacks.values())),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                _LOGGER.error("decode jpg callback error, %s, %s", self._did, result)
 
     async def __on_audio_decode_callback(self, data: bytes, timestamp: int, channel: int) -> None:
         """On audio decode callback."""
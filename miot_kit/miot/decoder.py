@@ -6,123 +6,213 @@ MIoT Decoder.
 """
 import asyncio
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import ctypes
+import functools
 import logging
 import os
-import subprocess
+import sys
 import threading
 import time
+from fractions import Fraction
 from pathlib import Path
-from typing import List, Callable, Coroutine, Optional
-from io import BytesIO
-from av.packet import Packet
-from av.codec import CodecContext
-from av.video.codeccontext import VideoCodecContext
-from av.audio.codeccontext import AudioCodecContext
-from av.codec.hwaccel import HWAccel
-from av.codec.context import ThreadType
-from av.audio.resampler import AudioResampler
-from av.video.frame import VideoFrame
-from av.audio.frame import AudioFrame
-from PIL import Image
-import av as av_module
-
-from .types import MIoTCameraFrameType, MIoTCameraCodec, MIoTCameraFrameData
-from .error import MIoTMediaDecoderError
+from typing import List, Callable, Coroutine, Optional, Tuple
 
 _LOGGER = logging.getLogger(__name__)
 
+_LIBS_LOADED: bool = False
+# FFmpeg libraries in dependency order. They are built without rpath, a library loaded before its
+# dependencies would resolve them against a system FFmpeg of the same major version.
+_FFMPEG_LIB_ORDER: Tuple[str, ...] = (
+    "libavutil", "libswresample", "libswscale", "libpostproc",
+    "libavcodec", "libavformat", "libavfilter", "libavdevice",
+)
+
+
+def _preload_shared_libs(lib_dir: Path, load_order: Tuple[str, ...] = ()) -> None:
+    """Preload shared libraries globally. Libraries named in load_order are loaded first in that order,
+    the others are retried until their dependencies are loaded."""
+    pending: List[Path] = sorted(lib for lib in lib_dir.glob("lib*.so*") if not lib.is_symlink())
+    for name in load_order:
+        for lib in [lib for lib in pending if lib.name.startswith(f"{name}.so")]:
+            pending.remove(lib)
+            try:
+                ctypes.CDLL(str(lib), mode=ctypes.RTLD_GLOBAL)
+            except OSError as e:
+                _LOGGER.warning("Failed to preload library %s, %s", lib.name, e)
+    while pending:
+        failed: List[Path] = []
+        for lib in pending:
+            try:
+                ctypes.CDLL(str(lib), mode=ctypes.RTLD_GLOBAL)
+            except OSError:
+                failed.append(lib)
+        if len(failed) == len(pending):
+            _LOGGER.warning("Failed to preload libraries: %s", [lib.name for lib in failed])
+            return
+        pending = failed
+    _LOGGER.info("Preloaded libraries: %s", lib_dir)
+
 
 def _setup_library_paths():
-    """Setup library paths for third-party FFmpeg, VAAPI, and PyAV libraries."""
+    """Setup third-party FFmpeg, VAAPI, and PyAV libraries, must run before PyAV is imported."""
+    global _LIBS_LOADED  # pylint: disable=global-statement
+    if _LIBS_LOADED:
+        return
+    _LIBS_LOADED = True
+
     third_party_dir = Path(__file__).parent.parent.parent / "third_party"
-    
+
     if not third_party_dir.exists():
         _LOGGER.debug("Third party directory not found, using system libraries")
         return
-    
-    # Setup FFmpeg library path
-    ffmpeg_lib = third_party_dir / "ffmpeg" / "linux" / "x86_64" / "lib"
-    if ffmpeg_lib.exists():
-        current_ld_path = os.environ.get('LD_LIBRARY_PATH', '')
-        if str(ffmpeg_lib) not in current_ld_path:
-            os.environ['LD_LIBRARY_PATH'] = f"{ffmpeg_lib}:{current_ld_path}"
-            _LOGGER.info(f"Added FFmpeg library path: {ffmpeg_lib}")
-    
-    # Setup VAAPI library path
+
+    # LD_LIBRARY_PATH is only read at process startup, the libraries are preloaded instead so
+    # that PyAV resolves them by soname. Too late once PyAV has been imported, it has already
+    # loaded its FFmpeg libraries.
+    if "av" in sys.modules:
+        _LOGGER.info("PyAV already imported, skip preloading third party libraries")
+        return
+
+    # Setup VAAPI libraries
     vaapi_lib = third_party_dir / "vaapi" / "linux" / "x86_64" / "lib"
     if vaapi_lib.exists():
-        current_ld_path = os.environ.get('LD_LIBRARY_PATH', '')
-        if str(vaapi_lib) not in current_ld_path:
-            os.environ['LD_LIBRARY_PATH'] = f"{vaapi_lib}:{current_ld_path}"
-            _LOGGER.info(f"Added VAAPI library path: {vaapi_lib}")
-        
-        # Set VAAPI driver path
+        _preload_shared_libs(vaapi_lib)
+
+        # Set VAAPI driver path, read by libva when a device is opened
         driver_path = vaapi_lib / "dri"
         if driver_path.exists():
-            os.environ['LIBVA_DRIVERS_PATH'] = str(driver_path)
-            _LOGGER.info(f"Set VAAPI driver path: {driver_path}")
-    
-    # Setup PyAV library path if built from source
+            os.environ["LIBVA_DRIVERS_PATH"] = str(driver_path)
+            _LOGGER.info("Set VAAPI driver path: %s", driver_path)
+
+    # Setup FFmpeg libraries
+    ffmpeg_lib = third_party_dir / "ffmpeg" / "linux" / "x86_64" / "lib"
+    if ffmpeg_lib.exists():
+        _preload_shared_libs(ffmpeg_lib, _FFMPEG_LIB_ORDER)
+
+    # Setup PyAV if built from source
     pyav_lib = third_party_dir / "pyav" / "linux" / "x86_64" / "lib"
     if pyav_lib.exists():
-        current_ld_path = os.environ.get('LD_LIBRARY_PATH', '')
-        if str(pyav_lib) not in current_ld_path:
-            os.environ['LD_LIBRARY_PATH'] = f"{pyav_lib}:{current_ld_path}"
-            _LOGGER.info(f"Added PyAV library path: {pyav_lib}")
-        
+        _preload_shared_libs(pyav_lib, _FFMPEG_LIB_ORDER)
+
         # Add PyAV to Python path
-        import sys
         python_version = f"{sys.version_info.major}.{sys.version_info.minor}"
-        pyav_site_packages = third_party_dir / "pyav" / "linux" / "x86_64" / "lib" / python_version / "site-packages"
-        if pyav_site_packages.exists():
+        pyav_site_packages = pyav_lib / python_version / "site-packages"
+        if pyav_site_packages.exists() and str(pyav_site_packages) not in sys.path:
             sys.path.insert(0, str(pyav_site_packages))
-            _LOGGER.info(f"Added PyAV to Python path: {pyav_site_packages}")
+            _LOGGER.info("Added PyAV to Python path: %s", pyav_site_packages)
 
 
-# Initialize library paths on module load
+# Initialize libraries on module load, before PyAV is imported
 _setup_library_paths()
 
+# pylint: disable=wrong-import-position
+from av.packet import Packet
+from av.codec import CodecContext
+from av.video.codeccontext import VideoCodecContext
+from av.audio.codeccontext import AudioCodecContext
+from av.codec.hwaccel import HWAccel, hwdevices_available
+from av.codec.context import ThreadType
+from av.audio.fifo import AudioFifo
+from av.audio.resampler import AudioResampler
+from av.video.frame import VideoFrame
+from av.video.reformatter import ColorRange, VideoReformatter
+from av.audio.frame import AudioFrame
+import av as av_module
+
+from .types import MIoTCameraFrameType, MIoTCameraCodec, MIoTCameraFrameData
+from .error import MIoTMediaDecoderError
+# pylint: enable=wrong-import-position
+
+_DEFAULT_VAAPI_DEVICE: str = "/dev/dri/renderD128"
+# Decoded audio is buffered and resampled in blocks of this duration, a partial block is flushed
+# once no audio arrived for this long
+_AUDIO_RESAMPLE_BLOCK_MS: int = 60
+# Max snapshots in flight (queued, encoding or being delivered), others are not encoded at all
+_JPEG_MAX_PENDING: int = 2
+# The access unit held by the video parser is flushed once no video data arrived for this long
+_VIDEO_PARSER_FLUSH_MS: int = 200
+# Niceness increment applied to decoder threads, negative values need privileges
+_DECODER_NICE: int = -5
+
+
+@functools.lru_cache(maxsize=8)
+def _probe_hw_accel(device_path: str = _DEFAULT_VAAPI_DEVICE) -> Tuple[bool, Optional[str]]:
+    """Detect if hardware acceleration is available, the result is cached per device path."""
+    try:
+        _LOGGER.info("PyAV version: %s", av_module.__version__)
+
+        # Check if VAAPI device exists
+        if os.path.exists(device_path) or os.path.exists("/dev/dri/card0"):
+            _LOGGER.info("VAAPI device detected, will attempt hardware acceleration")
+            return True, "vaapi"
+
+        # Check if the loaded FFmpeg supports VAAPI, no ffmpeg process is spawned
+        if "vaapi" in hwdevices_available():
+            _LOGGER.info("VAAPI hardware acceleration detected (via PyAV)")
+            return True, "vaapi"
+
+        _LOGGER.info("No VAAPI hardware acceleration available, will use software decoding")
+        return False, None
+
+    except Exception as e:  # pylint: disable=broad-except
+        _LOGGER.warning("Failed to detect hardware acceleration: %s", e)
+        return False, None
+
+
+# Probe hardware acceleration on module load
+_probe_hw_accel()
+
 
 class MIoTMediaRingBuffer():
     """Ring buffer."""
     _maxlen: int
-    _video_buffer: deque[MIoTCameraFrameData]
+    # Removed frames leave an empty slot until the head passes it, slots are twice maxlen
+    _video_slots: List[Optional[MIoTCameraFrameData]]
+    _video_head: int
+    # Occupied slots, including removed ones
+    _video_used: int
+    _video_size: int
+    _video_i_count: int
+    # Slot indexes of the buffered non-I frames, oldest first
+    _video_non_i_indexes: deque[int]
     _audio_buffer: deque[MIoTCameraFrameData]
     _cond: threading.Condition
 
     def __init__(self, maxlen: int = 20):
         self._maxlen = maxlen
-        self._video_buffer = deque(maxlen=maxlen)
+        self._video_slots = [None] * (maxlen * 2)
+        self._video_head = 0
+        self._video_used = 0
+        self._video_size = 0
+        self._video_i_count = 0
+        self._video_non_i_indexes = deque()
         self._audio_buffer = deque(maxlen=maxlen)
         self._cond = threading.Condition()
 
     def put_video(self, item: MIoTCameraFrameData) -> None:
         with self._cond:
             # When the queue is full, non-key frames are discarded first
-            if len(self._video_buffer) >= self._maxlen:
-                if item.frame_type == MIoTCameraFrameType.FRAME_I:
-                    removed: bool = False
-                    for i in range(len(self._video_buffer)):
-                        if self._video_buffer[i].frame_type != MIoTCameraFrameType.FRAME_I:
-                            del self._video_buffer[i]
-                            removed = True
-                            break
-                    if not removed:
-                        self._video_buffer.popleft()
-                    self._video_buffer.append(item)
-                    self._cond.notify()
-                else:
-                    # Drop non-I frame
-                    pass
+            if self._video_size >= self._maxlen:
                 _LOGGER.info("drop non-I frame, %s, %s", item.codec_id, item.timestamp)
-            else:
-                self._video_buffer.append(item)
+                if item.frame_type != MIoTCameraFrameType.FRAME_I:
+                    # Drop non-I frame
+                    return
+                if self._video_i_count < self._video_size:
+                    self._remove_oldest_non_i_video()
+                else:
+                    self._pop_video()
+            notify: bool = self._is_empty()
+            self._push_video(item)
+            if notify:
                 self._cond.notify()
 
     def put_audio(self, item: MIoTCameraFrameData) -> None:
         with self._cond:
+            notify: bool = self._is_empty()
             self._audio_buffer.append(item)
-            self._cond.notify()
+            if notify:
+                self._cond.notify()
 
     def step(
         self,
@@ -132,23 +222,66 @@ class MIoTMediaRingBuffer():
     ) -> None:
         on_frame: Callable[[MIoTCameraFrameData], None] = on_video_frame
         frame_data: Optional[MIoTCameraFrameData] = None
-        # get frame
+        # get frame, wait and take it within one lock acquisition
         with self._cond:
-            if self._video_buffer:
-                frame_data = self._video_buffer.popleft()
+            if self._is_empty():
+                self._cond.wait(timeout=timeout)
+            if self._video_size:
+                frame_data = self._pop_video()
             elif self._audio_buffer:
                 frame_data = self._audio_buffer.popleft()
                 on_frame = on_audio_frame
-            else:
-                self._cond.wait(timeout=timeout)
         # handle frame
         if frame_data:
             on_frame(frame_data)
 
     def stop(self):
+        with self._cond:
+            self._video_slots = [None] * (self._maxlen * 2)
+            self._video_head = 0
+            self._video_used = 0
+            self._video_size = 0
+            self._video_i_count = 0
+            self._video_non_i_indexes.clear()
+            self._audio_buffer.clear()
+            # Wake up the consumer so it does not wait out the timeout
+            self._cond.notify_all()
         del self._cond
-        self._video_buffer.clear()
-        self._audio_buffer.clear()
+
+    def _is_empty(self) -> bool:
+        # The consumer only waits when both buffers are empty
+        return not self._video_size and not self._audio_buffer
+
+    def _push_video(self, item: MIoTCameraFrameData) -> None:
+        index: int = (self._video_head + self._video_used) % len(self._video_slots)
+        self._video_slots[index] = item
+        self._video_used += 1
+        self._video_size += 1
+        if item.frame_type == MIoTCameraFrameType.FRAME_I:
+            self._video_i_count += 1
+        else:
+            self._video_non_i_indexes.append(index)
+
+    def _pop_video(self) -> MIoTCameraFrameData:
+        # Skip the slots of removed frames
+        while self._video_used and self._video_slots[self._video_head] is None:
+            self._video_head = (self._video_head + 1) % len(self._video_slots)
+            self._video_used -= 1
+        item: MIoTCameraFrameData = self._video_slots[self._video_head]  # type: ignore
+        self._video_slots[self._video_head] = None
+        self._video_head = (self._video_head + 1) % len(self._video_slots)
+        self._video_used -= 1
+        self._video_size -= 1
+        if item.frame_type == MIoTCameraFrameType.FRAME_I:
+            self._video_i_count -= 1
+        else:
+            self._video_non_i_indexes.popleft()
+        return item
+
+    def _remove_oldest_non_i_video(self) -> None:
+        # O(1), the slot is left empty instead of shifting the older frames
+        self._video_slots[self._video_non_i_indexes.popleft()] = None
+        self._video_size -= 1
 
 
 class MIoTMediaDecoder(threading.Thread):
@@ -156,10 +289,12 @@ class MIoTMediaDecoder(threading.Thread):
     _main_loop: asyncio.AbstractEventLoop
     _running: bool
     _frame_interval: int
+    _frame_interval_ns: int
     _enable_hw_accel: bool
     _enable_audio: bool
     _hw_accel_available: bool
     _hw_accel_type: Optional[str]
+    _hw_device_path: str
 
     # format: did, data, ts, channel
     _video_callback: Callable[[bytes, int, int], Coroutine]
@@ -170,10 +305,26 @@ class MIoTMediaDecoder(threading.Thread):
     _video_decoder: Optional[CodecContext]
     _audio_decoder: Optional[CodecContext]
     _resampler: AudioResampler
+    _audio_fifo: Optional[AudioFifo]
+    _audio_block_samples: int
+    _audio_block_ts: Optional[int]
+    _audio_block_channel: int
+    _audio_last_ns: int
+    # Payload that started the access unit held by the video parser
+    _video_pending: Optional[MIoTCameraFrameData]
+    _video_pending_ns: int
+    _jpeg_encoder: Optional[VideoCodecContext]
+    _reformatter: VideoReformatter
+    _jpeg_executor: ThreadPoolExecutor
+    _jpeg_slots: threading.Semaphore
+    # format: callback, data, ts, channel
+    _pending_callbacks: deque[Tuple[Callable[[bytes, int, int], Coroutine], bytes, int, int]]
+    _pending_lock: threading.Lock
 
     _current_jpg_width: int
     _current_jpg_height: int
-    _last_jpeg_ts: int
+    _current_jpg_format: str
+    _last_jpeg_ns: int
 
     def __init__(
         self,
@@ -183,11 +334,13 @@ class MIoTMediaDecoder(threading.Thread):
         enable_hw_accel: bool = True,
         enable_audio: bool = True,
         main_loop: Optional[asyncio.AbstractEventLoop] = None,
+        hw_device_path: Optional[str] = None,
     ) -> None:
         super().__init__()
         self._main_loop = main_loop or asyncio.get_running_loop()
         self._running = False
         self._frame_interval = frame_interval
+        self._frame_interval_ns = frame_interval * 1_000_000
         self._enable_hw_accel = enable_hw_accel
         self._enable_audio = enable_audio
 
@@ -202,17 +355,37 @@ class MIoTMediaDecoder(threading.Thread):
         self._video_decoder = None
         self._audio_decoder = None
         self._resampler = None  # type: ignore
-
-        self._last_jpeg_ts = 0
+        self._audio_fifo = None
+        self._audio_block_samples = 0
+        self._audio_block_ts = None
+        self._audio_block_channel = 0
+        self._audio_last_ns = 0
+        self._video_pending = None
+        self._video_pending_ns = 0
+        self._jpeg_encoder = None
+        # Shared across frames so the swscale context is reused
+        self._reformatter = VideoReformatter()
+        # Single worker, the encoder and reformatter are not shared between threads
+        self._jpeg_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jpeg_encoder")
+        self._jpeg_slots = threading.Semaphore(_JPEG_MAX_PENDING)
+        self._pending_callbacks = deque()
+        self._pending_lock = threading.Lock()
+
+        self._current_jpg_width = 0
+        self._current_jpg_height = 0
+        self._current_jpg_format = ""
+        self._last_jpeg_ns = 0
         self._hw_accel_available = False
         self._hw_accel_type = None
-        
+        self._hw_device_path = hw_device_path or _DEFAULT_VAAPI_DEVICE
+
         # Detect hardware acceleration availability
         if self._enable_hw_accel:
-            self._hw_accel_available = self._detect_hw_acceleration()
+            self._hw_accel_available, self._hw_accel_type = _probe_hw_accel(self._hw_device_path)
 
     def run(self) -> None:
         """Start the decoder."""
+        self._setup_thread_scheduling()
         self._running = True
         while self._running:
             try:
@@ -220,19 +393,30 @@ class MIoTMediaDecoder(threading.Thread):
                     on_video_frame=self._on_video_callback,
                     on_audio_frame=self._on_audio_callback
                 )
+                self._flush_video_parser()
+                self._flush_audio_fifo()
             except Exception as e:  # pylint: disable=broad-except
                 _LOGGER.error("frame data handle error, %s", e)
                 if self._main_loop.is_closed():
                     break
+        # Send the audio still buffered when stopped
+        try:
+            self._flush_audio_fifo(force=True)
+        except Exception as e:  # pylint: disable=broad-except
+            _LOGGER.error("audio flush error, %s", e)
         _LOGGER.info("decoder stopped")
 
     def stop(self) -> None:
         """Stop the decoder."""
         self._running = False
         self._queue.stop()
+        self._jpeg_executor.shutdown(wait=True, cancel_futures=True)
+        # The decoder thread drains the audio fifo before exiting
+        self.join()
         self._video_decoder = None
         self._audio_decoder = None
-        self.join()
+        self._audio_fifo = None
+        self._jpeg_encoder = None
 
     def push_video_frame(self, frame_data: MIoTCameraFrameData) -> None:
         self._queue.put_video(frame_data)
@@ -240,81 +424,59 @@ class MIoTMediaDecoder(threading.Thread):
     def push_audio_frame(self, frame_data: MIoTCameraFrameData) -> None:
         self._queue.put_audio(frame_data)
 
-    def _detect_hw_acceleration(self) -> bool:
-        """Detect if hardware acceleration is available."""
+    def _setup_thread_scheduling(self) -> None:
+        """Raise the decoder thread priority, linux only."""
+        # On linux nice only applies to the calling thread, elsewhere it would change the whole process.
+        # Threads created later from this thread (JPEG encoder worker, FFmpeg slice threads) inherit it,
+        # which is why the thread is not pinned to a CPU.
+        if not sys.platform.startswith("linux"):
+            return
         try:
-            # Check PyAV version
-            pyav_version = av_module.__version__
-            _LOGGER.info(f"PyAV version: {pyav_version}")
-            
-            # Check if VAAPI device exists
-            if os.path.exists("/dev/dri/renderD128") or os.path.exists("/dev/dri/card0"):
-                _LOGGER.info("VAAPI device detected, will attempt hardware acceleration")
-                self._hw_accel_type = 'vaapi'
-                return True
-            
-            # Try to check if FFmpeg has VAAPI support via command line
-            try:
-                result = subprocess.run(
-                    ["ffmpeg", "-hwaccels"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    check=False
-                )
-                if result.returncode == 0:
-                    hwaccels = result.stdout
-                    if "vaapi" in hwaccels.lower():
-                        self._hw_accel_type = 'vaapi'
-                        _LOGGER.info("VAAPI hardware acceleration detected (via FFmpeg)")
-                        return True
-            except FileNotFoundError:
-                _LOGGER.debug("ffmpeg command not found for hwaccel check")
-            
-            _LOGGER.info("No VAAPI hardware acceleration available, will use software decoding")
-            return False
-            
-        except Exception as e:
-            _LOGGER.warning(f"Failed to detect hardware acceleration: {e}")
-            return False
+            os.nice(_DECODER_NICE)
+        except OSError as e:
+            _LOGGER.debug("set decoder nice failed, %s", e)
 
     def _init_hw_decoder(self, codec_name: str) -> VideoCodecContext:
         """Initialize hardware decoder for HEVC/H.264 with VAAPI support."""
         try:
-            _LOGGER.info(f"Initializing VAAPI hardware decoder for {codec_name}")      
-            
-            device = "/dev/dri/renderD128" 
-            _LOGGER.info(f"Using VAAPI device: {device}")
-
+            _LOGGER.info(
+                "Initializing %s hardware decoder for %s, device=%s",
+                self._hw_accel_type, codec_name, self._hw_device_path)
             hwaccel = HWAccel(
-                device_type="vaapi",
-                device=device,
+                device_type=self._hw_accel_type or "vaapi",
+                device=self._hw_device_path,
+                allow_software_fallback=True,
             )
-
-            decoder = VideoCodecContext.create(
+            decoder: VideoCodecContext = CodecContext.create(  # type: ignore
                 codec_name,
                 "r",
                 hwaccel=hwaccel
             )
-
-            decoder.options = {
-                "hwaccel": "vaapi",
-                "hwaccel_device": device,
-                "hwaccel_output_format": "vaapi",
-            }
-
-            _LOGGER.info("VAAPI acceleration options set")           
-            # Set thread type to auto for better performance
+            # Frame threading does not apply to hardware decoding
             decoder.thread_type = ThreadType.NONE
-            
-            _LOGGER.info(f"VAAPI hardware decoder for {codec_name} initialized successfully")
+            _LOGGER.info(
+                "Hardware decoder for %s initialized, is_hwaccel=%s", codec_name, decoder.is_hwaccel)
             return decoder
-            
-        except Exception as e:
-            _LOGGER.warning(f"Failed to init VAAPI HW decoder for {codec_name}: {e}, fallback to software")
+
+        except Exception as e:  # pylint: disable=broad-except
+            _LOGGER.warning("Failed to init VAAPI HW decoder for %s: %s, fallback to software", codec_name, e)
             # Fallback to software decoder
             return VideoCodecContext.create(codec_name, "r")
 
+    def _init_jpeg_encoder(self, width: int, height: int, pix_fmt: str) -> VideoCodecContext:
+        """Initialize MJPEG encoder for the decoded frame size and format."""
+        encoder = VideoCodecContext.create("mjpeg", "w")
+        encoder.width = width
+        encoder.height = height
+        # Must match the frame format, otherwise PyAV reformats the frame again on encode
+        encoder.pix_fmt = pix_fmt
+        encoder.color_range = ColorRange.JPEG
+        encoder.time_base = Fraction(1, 1000)
+        # Fixed qscale 2, close to PIL JPEG quality 90
+        encoder.options = {"qmin": "2", "qmax": "2"}
+        _LOGGER.info("MJPEG encoder created, %dx%d, %s", width, height, pix_fmt)
+        return encoder
+
     def _on_video_callback(self, frame_data: MIoTCameraFrameData) -> None:
         if not self._video_decoder:
             # Create video decoder with hardware acceleration support
@@ -336,26 +498,101 @@ class MIoTMediaDecoder(threading.Thread):
         if self._frame_interval <= 0:
             return
             
-        pkt = Packet(frame_data.data)
-        frames: List[VideoFrame] = self._video_decoder.decode(pkt)  # type: ignore
-        now_ts = int(time.time()*1000)
-        if now_ts - self._last_jpeg_ts >= self._frame_interval:
-            if not frames:
-                _LOGGER.info("video frame is empty, %d, %d", frame_data.codec_id, frame_data.timestamp)
-                self._last_jpeg_ts = now_ts
-                return
-            frame = frames[0]
-            # _LOGGER.debug("video frame, %d, %d", frame.height, frame.width)
-            rgb_frame: VideoFrame = frame.to_rgb()
-            img: Image.Image = rgb_frame.to_image()
-            buf: BytesIO = BytesIO()
-            img.save(buf, format="JPEG", quality=90)
-            jpeg_data = buf.getvalue()
-            self._main_loop.call_soon_threadsafe(
-                self._main_loop.create_task,
-                self._video_callback(jpeg_data, frame_data.timestamp, frame_data.channel)
-            )
-            self._last_jpeg_ts = now_ts
+        if not self._video_pending:
+            self._video_pending = frame_data
+        self._video_pending_ns = time.monotonic_ns()
+        # Let the FFmpeg parser split/accumulate the raw bitstream into complete access units
+        packets: List[Packet] = self._video_decoder.parse(frame_data.data)  # type: ignore
+        if not packets:
+            return
+        # An access unit is only returned once the next one starts, the first one belongs to the
+        # pending payload and the others to this one
+        packets[0].pts = self._video_pending.timestamp
+        for pkt in packets[1:]:
+            pkt.pts = frame_data.timestamp
+        # The parser holds the tail of this payload
+        self._video_pending = frame_data
+        self._decode_video_packets(packets, frame_data)
+
+    def _flush_video_parser(self) -> None:
+        """Decode the access unit held by the parser once the video stream pauses."""
+        if (
+            not self._video_pending
+            or time.monotonic_ns() - self._video_pending_ns < _VIDEO_PARSER_FLUSH_MS * 1_000_000
+        ):
+            return
+        pending: MIoTCameraFrameData = self._video_pending
+        self._video_pending = None
+        if not self._video_decoder:
+            return
+        packets: List[Packet] = self._video_decoder.parse(None)  # type: ignore
+        for pkt in packets:
+            pkt.pts = pending.timestamp
+        self._decode_video_packets(packets, pending)
+
+    def _decode_video_packets(self, packets: List[Packet], frame_data: MIoTCameraFrameData) -> None:
+        """Decode parsed packets, the packet pts carries the timestamp of the source payload."""
+        frames: List[VideoFrame] = []
+        for pkt in packets:
+            frames.extend(self._video_decoder.decode(pkt))  # type: ignore
+        if not frames:
+            _LOGGER.debug("video frame is empty, %d, %d", frame_data.codec_id, frame_data.timestamp)
+            return
+        # Monotonic clock, the interval check is immune to wall clock steps
+        now_ns: int = time.monotonic_ns()
+        if now_ns - self._last_jpeg_ns < self._frame_interval_ns:
+            return
+        # Back-pressure, frames keep being decoded but are not encoded while consumers are busy
+        if not self._running or not self._jpeg_slots.acquire(blocking=False):
+            _LOGGER.debug("jpeg consumer busy, skip frame, %d", frame_data.timestamp)
+            return
+        # _LOGGER.debug("video frame, %d, %d", frame.height, frame.width)
+        # Decoders may delay or reorder frames, the pts keeps the timestamp of the frame itself
+        timestamp: int = frames[0].pts if frames[0].pts is not None else frame_data.timestamp
+        try:
+            self._jpeg_executor.submit(
+                self._encode_jpeg, frames[0], timestamp, frame_data.channel)
+        except RuntimeError:
+            # stop() shut the executor down after the _running check
+            self._jpeg_slots.release()
+            return
+        self._last_jpeg_ns = now_ns
+
+    def _encode_jpeg(self, frame: VideoFrame, timestamp: int, channel: int) -> None:
+        """Encode the frame to JPEG on the encoder thread."""
+        try:
+            # Full range YUV 4:2:0 frames are encoded as is, without a YUV -> RGB -> YCbCr round
+            # trip. Limited range and hardware decoded (nv12) frames only get converted to full range.
+            if not (
+                frame.format.name == "yuvj420p"
+                or (frame.format.name == "yuv420p" and frame.color_range == ColorRange.JPEG)
+            ):
+                frame = self._reformatter.reformat(
+                    frame, format="yuv420p", dst_color_range=ColorRange.JPEG)
+            if (
+                not self._jpeg_encoder
+                or frame.width != self._current_jpg_width
+                or frame.height != self._current_jpg_height
+                or frame.format.name != self._current_jpg_format
+            ):
+                self._jpeg_encoder = self._init_jpeg_encoder(frame.width, frame.height, frame.format.name)
+                self._current_jpg_width = frame.width
+                self._current_jpg_height = frame.height
+                self._current_jpg_format = frame.format.name
+            frame.pts = None
+            # Packets expose the buffer protocol, join copies the encoder output only once
+            jpeg_data: bytes = b"".join(self._jpeg_encoder.encode(frame))
+            # The slot is released once the video callback is done
+            self._post_callback(self._deliver_jpeg, jpeg_data, timestamp, channel)
+        except Exception as e:  # pylint: disable=broad-except
+            _LOGGER.error("jpeg encode error, %s", e)
+            self._jpeg_slots.release()
+
+    async def _deliver_jpeg(self, data: bytes, timestamp: int, channel: int) -> None:
+        try:
+            await self._video_callback(data, timestamp, channel)
+        finally:
+            self._jpeg_slots.release()
 
     def _on_audio_callback(self, frame_data: MIoTCameraFrameData) -> None:
         if not self._audio_decoder:
@@ -363,18 +600,65 @@ class MIoTMediaDecoder(threading.Thread):
             if frame_data.codec_id == MIoTCameraCodec.AUDIO_OPUS:
                 self._audio_decoder = AudioCodecContext.create("opus", "r")
             self._resampler = AudioResampler(format="s16", layout="mono", rate=16000)
+            self._audio_fifo = AudioFifo()
             _LOGGER.info("audio decoder created, %s", frame_data.codec_id)
+        self._audio_last_ns = time.monotonic_ns()
         pkt = Packet(frame_data.data)
         frames: List[AudioFrame] = self._audio_decoder.decode(pkt)  # type: ignore
-        pcm_bytes: bytes = b""
         for frame in frames:
-            rs_frames = self._resampler.resample(frame)
-            for rs_frame in rs_frames:
-                pcm_bytes += rs_frame.to_ndarray().tobytes()
-        self._main_loop.call_soon_threadsafe(
-            self._main_loop.create_task,
-            self._audio_callback(pcm_bytes, frame_data.timestamp, frame_data.channel)
-        )
+            if self._audio_block_ts is None:
+                self._audio_block_ts = frame_data.timestamp
+                self._audio_block_channel = frame_data.channel
+            if not self._audio_block_samples:
+                self._audio_block_samples = frame.sample_rate * _AUDIO_RESAMPLE_BLOCK_MS // 1000
+            # Packets carry no pts, the fifo only needs contiguous samples
+            frame.pts = None
+            self._audio_fifo.write(frame)  # type: ignore
+        if not self._audio_block_samples or self._audio_fifo.samples < self._audio_block_samples:  # type: ignore
+            return
+        self._post_audio_block()
+
+    def _flush_audio_fifo(self, force: bool = False) -> None:
+        """Send the partial audio block once the audio stream pauses."""
+        if (
+            not self._audio_fifo
+            or not self._audio_fifo.samples
+            or (
+                not force
+                and time.monotonic_ns() - self._audio_last_ns < _AUDIO_RESAMPLE_BLOCK_MS * 1_000_000
+            )
+        ):
+            return
+        self._post_audio_block()
+
+    def _post_audio_block(self) -> None:
+        # Resample the whole buffered block at once
+        pcm_chunks: List[memoryview] = []
+        for rs_frame in self._resampler.resample(self._audio_fifo.read()):  # type: ignore
+            # Plane buffers are padded, only take the valid s16 mono samples
+            pcm_chunks.append(memoryview(rs_frame.planes[0])[:rs_frame.samples * 2])
+        pcm_bytes: bytes = b"".join(pcm_chunks)
+        timestamp: int = self._audio_block_ts  # type: ignore
+        self._audio_block_ts = None
+        self._post_callback(self._audio_callback, pcm_bytes, timestamp, self._audio_block_channel)
+
+    def _post_callback(
+        self, callback: Callable[[bytes, int, int], Coroutine], data: bytes, timestamp: int, channel: int
+    ) -> None:
+        """Queue a callback for the main loop, only the first pending one wakes up the loop."""
+        with self._pending_lock:
+            self._pending_callbacks.append((callback, data, timestamp, channel))
+            wakeup: bool = len(self._pending_callbacks) == 1
+        if wakeup:
+            self._main_loop.call_soon_threadsafe(self._drain_callbacks)
+
+    def _drain_callbacks(self) -> None:
+        """Create tasks for all pending callbacks, runs on the main loop."""
+        with self._pending_lock:
+            pending = list(self._pending_callbacks)
+            self._pending_callbacks.clear()
+        for callback, data, timestamp, channel in pending:
+            self._main_loop.create_task(callback(data, timestamp, channel))
 
 
 class MIoTMediaRecorder(threading.Thread):
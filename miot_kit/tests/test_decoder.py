@@ -0,0 +1,194 @@
+# Copyright (C) 2025 Xiaomi Corporation
+# This software may be used and distributed according to the terms of the Xiaomi Miloco License Agreement.
+
+"""
+Unit test for decoder.py.
+"""
+import asyncio
+import logging
+import random
+import threading
+from collections import deque
+from fractions import Fraction
+from typing import Deque, List, Tuple
+
+import pytest
+from av.codec import CodecContext
+from av.video.frame import VideoFrame
+
+from miot.decoder import MIoTMediaDecoder, MIoTMediaRingBuffer
+from miot.types import MIoTCameraCodec, MIoTCameraFrameData, MIoTCameraFrameType
+
+# pylint: disable=protected-access, unused-argument, missing-function-docstring
+_LOGGER = logging.getLogger(__name__)
+
+
+def _video_frame(index: int, frame_type: MIoTCameraFrameType, data: bytes = b'') -> MIoTCameraFrameData:
+    return MIoTCameraFrameData(
+        codec_id=MIoTCameraCodec.VIDEO_H264, length=len(data), timestamp=index, sequence=index,
+        frame_type=frame_type, channel=0, data=data)
+
+
+def _h264_stream(count: int) -> List[Tuple[bytes, bool]]:
+    """Encode a short H.264 stream without B-frames, one access unit per payload."""
+    try:
+        encoder = CodecContext.create('libx264', 'w')
+    except Exception as exc:  # pylint: disable=broad-except
+        pytest.skip(f'libx264 encoder not available, {exc}')
+    encoder.width, encoder.height, encoder.pix_fmt = 160, 120, 'yuv420p'
+    encoder.time_base = Fraction(1, 30)
+    encoder.options = {'tune': 'zerolatency', 'x264-params': 'bframes=0:keyint=10:log-level=error'}
+    packets = []
+    for index in range(count):
+        frame = VideoFrame(160, 120, 'yuv420p')
+        for plane in frame.planes:
+            plane.update(bytes([index * 8 % 256]) * plane.buffer_size)
+        frame.pts = index
+        packets.extend(encoder.encode(frame))
+    packets.extend(encoder.encode(None))
+    return [(bytes(packet), packet.is_keyframe) for packet in packets]
+
+
+async def _push_h264(
+    decoder: MIoTMediaDecoder, stream: List[Tuple[bytes, bool]], start: int = 0, interval: float = 0.02
+) -> None:
+    for index, (data, is_keyframe) in enumerate(stream, start):
+        decoder.push_video_frame(_video_frame(
+            index, MIoTCameraFrameType.FRAME_I if is_keyframe else MIoTCameraFrameType.FRAME_P, data))
+        await asyncio.sleep(interval)
+
+
+def _reference_put(buffer: Deque[MIoTCameraFrameData], item: MIoTCameraFrameData, maxlen: int) -> None:
+    """Deque based queue the ring buffer replaced, used as the expected behavior."""
+    if len(buffer) >= maxlen:
+        if item.frame_type != MIoTCameraFrameType.FRAME_I:
+            return
+        for index, frame in enumerate(buffer):
+            if frame.frame_type != MIoTCameraFrameType.FRAME_I:
+                del buffer[index]
+                break
+        else:
+            buffer.popleft()
+    buffer.append(item)
+
+
+@pytest.mark.parametrize('put_ratio', [0.6, 0.9])
+def test_ring_buffer_matches_reference(put_ratio: float):
+    """Random puts and steps give the same frames as the reference queue."""
+    for seed in range(50):
+        rnd = random.Random(seed)
+        maxlen = rnd.randint(1, 8)
+        ring_buffer = MIoTMediaRingBuffer(maxlen=maxlen)
+        reference: Deque[MIoTCameraFrameData] = deque()
+        for index in range(400):
+            if rnd.random() < put_ratio:
+                item = _video_frame(
+                    index, MIoTCameraFrameType.FRAME_I if rnd.random() < 0.4 else MIoTCameraFrameType.FRAME_P)
+                ring_buffer.put_video(item)
+                _reference_put(reference, item, maxlen)
+                assert ring_buffer._video_size == len(reference)
+                assert ring_buffer._video_used <= len(ring_buffer._video_slots)
+            else:
+                got: List[int] = []
+                ring_buffer.step(lambda f, got=got: got.append(f.timestamp), lambda f: None, timeout=0)
+                expected: List[int] = [reference.popleft().timestamp] if reference else []
+                assert got == expected, (seed, index)
+        ring_buffer.stop()
+
+
+def test_ring_buffer_stop():
+    """stop() clears the buffer, including removed frame slots, and wakes up a waiting consumer."""
+    ring_buffer = MIoTMediaRingBuffer(maxlen=4)
+    for index, frame_type in enumerate([
+        MIoTCameraFrameType.FRAME_I, MIoTCameraFrameType.FRAME_P,
+        MIoTCameraFrameType.FRAME_P, MIoTCameraFrameType.FRAME_I
+    ]):
+        ring_buffer.put_video(_video_frame(index, frame_type))
+    # Removes the oldest non-I frame, its slot stays behind the head
+    ring_buffer.put_video(_video_frame(4, MIoTCameraFrameType.FRAME_I))
+    got: List[int] = []
+    for _ in range(4):
+        ring_buffer.step(lambda f: got.append(f.timestamp), lambda f: None, timeout=0)
+    assert got == [0, 2, 3, 4]
+
+    consumer = threading.Thread(
+        target=ring_buffer.step, args=(lambda f: got.append(f.timestamp), lambda f: None, 5))
+    consumer.start()
+    # Let the consumer wait on the empty buffer
+    consumer.join(timeout=0.1)
+    ring_buffer.stop()
+    consumer.join(timeout=1)
+    assert not consumer.is_alive()
+    assert ring_buffer._video_size == 0 and ring_buffer._video_used == 0
+    assert got == [0, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_decoder_snapshot_timestamps():
+    """Each snapshot keeps the timestamp of its payload, the last frame before a pause is sent too."""
+    timestamps: List[int] = []
+
+    async def on_jpeg(data: bytes, timestamp: int, channel: int) -> None:
+        assert data[:2] == b'\xff\xd8'
+        timestamps.append(timestamp)
+
+    decoder = MIoTMediaDecoder(
+        frame_interval=1, video_callback=on_jpeg, enable_hw_accel=False, enable_audio=False)
+    decoder.start()
+    stream = _h264_stream(12)
+    try:
+        await _push_h264(decoder, stream[:6])
+        # The parser holds the last access unit until the stream pause is detected
+        await asyncio.sleep(0.6)
+        assert timestamps == list(range(6))
+        await _push_h264(decoder, stream[6:], start=6)
+        await asyncio.sleep(0.6)
+        assert timestamps == list(range(12))
+    finally:
+        decoder.stop()
+
+
+@pytest.mark.asyncio
+async def test_decoder_snapshot_back_pressure():
+    """Snapshots are skipped while the consumer is busy, and sent again once it is done."""
+    timestamps: List[int] = []
+    release = asyncio.Event()
+
+    async def on_jpeg(data: bytes, timestamp: int, channel: int) -> None:
+        timestamps.append(timestamp)
+        await release.wait()
+
+    decoder = MIoTMediaDecoder(
+        frame_interval=1, video_callback=on_jpeg, enable_hw_accel=False, enable_audio=False)
+    decoder.start()
+    stream = _h264_stream(20)
+    try:
+        await _push_h264(decoder, stream[:10])
+        await asyncio.sleep(0.3)
+        # Only the two snapshot slots were handed out
+        assert timestamps == [0, 1]
+        release.set()
+        await _push_h264(decoder, stream[10:], start=10)
+        await asyncio.sleep(0.6)
+        assert timestamps[2:] == list(range(10, 20))
+    finally:
+        decoder.stop()
+
+
+def test_decoder_submit_after_stop_releases_slot():
+    """A frame decoded after the encoder executor was shut down gives its snapshot slot back."""
+    loop = asyncio.new_event_loop()
+
+    async def on_jpeg(data: bytes, timestamp: int, channel: int) -> None:
+        pass
+
+    decoder = MIoTMediaDecoder(
+        frame_interval=1, video_callback=on_jpeg, enable_hw_accel=False, enable_audio=False, main_loop=loop)
+    decoder._running = True
+    decoder._jpeg_executor.shutdown()
+    for index, (data, is_keyframe) in enumerate(_h264_stream(3)):
+        decoder._on_video_callback(_video_frame(
+            index, MIoTCameraFrameType.FRAME_I if is_keyframe else MIoTCameraFrameType.FRAME_P, data))
+    assert decoder._jpeg_slots.acquire(blocking=False)
+    assert decoder._jpeg_slots.acquire(blocking=False)
+    loop.close()